@@ -1,18 +1,25 @@
 # backend/app.py
-import os, json, time, random
-from typing import Dict, Any, Set, List
+import os, time, random
+from typing import Set, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import requests
 
-from order_brain import OrderBrain
+from menu_catalog import MenuCatalog
+from menu_feed import MenuFeed, accepts_gzip
+from prompt_builder import PromptBuilder
+from kitchen_stream import KitchenHub, kitchen_ticket
+from order_brain import OrderBrain, cap_utterance
 from pos_adapter import POSAdapter
+from pricing import PricingEngine
+from tracing import Tracer, SESSION_HEADER
 from policy import (
-    MAX_QTY_PER_LINE, MAX_TOTAL_ITEMS,
-    build_menu_index, analyze_utterance_flags, validate_order
+    MAX_QTY_PER_LINE, MAX_TOTAL_ITEMS, MAX_UTTERANCE_CHARS, PARSE_BUDGET_MS,
+    analyze_utterance_flags, validate_order
 )
 
 # --- env & config ---
@@ -22,77 +29,28 @@ OPENAI_BASE_URL   = os.getenv("OPENAI_BASE_URL", "https://api.openai.com")
 REALTIME_MODEL    = os.getenv("OPENAI_REALTIME_MODEL", "gpt-4o-realtime-preview")
 MODEL_TEMPERATURE = float(os.getenv("MODEL_TEMPERATURE", "0.65"))  # min 0.6 côté Realtime
 TEMP_JITTER       = float(os.getenv("MODEL_TEMPERATURE_JITTER", "0.05"))
+SITE_ID           = os.getenv("SITE_ID", "default")
+# sites servis (écrans cuisine) : tout autre "site" client est refusé, le hub n'a que ces clés
+SITE_IDS          = {s.strip() for s in os.getenv("SITE_IDS", SITE_ID).split(",") if s.strip()} | {SITE_ID}
 
 if not OPENAI_API_KEY:
     raise RuntimeError("OPENAI_API_KEY missing")
 
-# --- guardrails texte ---
-AGENT_INSTRUCTIONS = """
-Tu es l’assistant DRIVE de QUICK (France). Français uniquement.
-
-LIMITES & SOURCES
-- Tu NE PROPOSES QUE des produits Quick présents dans le menu fourni par le serveur (menu.json).
-- Catégories autorisées : Menus, Menus Enfants, Burgers, Salades, Frites, Finger food,
-  Desserts, Boissons froides, Boissons chaudes.
-- Interdits : autres cuisines/marques (sushis, pizzas, kebab…), alcool. Si demandé : refuse poliment
-  et propose une alternative Quick proche (ex. poisson → Long Fish). N’invente JAMAIS de produit.
-
-BOISSONS AUTORISÉES (exemples) :
-{DRINKS_TEXT}
-
-RÈGLES BOISSON :
-- Toujours proposer 3 choix concrets par défaut (ex. Coca-Cola, Fanta, Eau).
-- Si le client dit « sans sucre », l'interpréter comme « Coca-Cola Sans Sucres » (sauf autre marque citée).
-- Ne JAMAIS valider un menu sans boisson explicitement choisie.
-
-COMPRÉHENSION & CLARIFICATION
-- Si un nom est inconnu : « Je n’ai pas cet article. Voulez-vous plutôt <ALTERNATIVE_QUICK> ? »
-- Si ambigu (taille boisson/frites, Zéro/Sans sucres, options oignons/sauce) → pose UNE question fermée.
-- Si bruits/inaudible : « Je vous entends mal, après le bip, pouvez-vous répéter ? »
-
-UPSÉLL
-- 1 seul upsell pertinent par tour (XL boisson/frites, dessert/café, convertir burger → MENU). Jamais insistant.
-
-ENFANTS / ORIENTATION
-- <6 ans → Menu Kids ; 7–11 ans → Menu Kids ou sandwich simple + petite boisson ;
-  léger → Salade + eau ; très faim → Menu XL ; budget serré → Junior Giant/Value.
-
-FLUX DE CONVERSATION
-- Pas de barge-in : ne parle pas en même temps que le client.
-- Après « c’est tout » : RÉCAPITULER (produits, tailles, boissons, options, quantités),
-  puis : « Je transmets la commande en cuisine. »
-
-CONFORMITÉ & ABUS
-- Pas d’infos personnelles. Allergènes : « La carte allergènes est disponible au comptoir. »
-- Quantités : maximum 10 par article, 30 au total. Si dépassé : refuse poliment et propose une quantité raisonnable.
-- Langage injurieux : rappeler une fois la courtoisie ; si répétition, passer à un équipier.
-
-AUTO-CORRECTION
-- Si tu proposes un article non-Quick ou hors menu : excuse-toi et corrige immédiatement en ne proposant que Quick.
-""".strip()
-
 # --- menu / brain / pos ---
-MENU_PATH = os.path.join(os.path.dirname(__file__), "menu.json")
-with open(MENU_PATH, "r", encoding="utf-8") as f:
-    menu = json.load(f)
+MENU_PATH   = os.path.join(os.path.dirname(__file__), "menu.json")
+PRICES_PATH = os.path.join(os.path.dirname(__file__), "prices.json")
+CATALOG     = MenuCatalog.load(MENU_PATH, PRICES_PATH)
+PRICING     = PricingEngine(CATALOG)
 
-def list_drinks(menu: Dict[str, Any]) -> List[str]:
-    drinks = []
-    for it in menu.get("items", []):
-        if it.get("category") in ("cold_drinks", "hot_drinks"):
-            name = it.get("name")
-            if name:
-                drinks.append(name)
-    return sorted(set(drinks))[:30]
+brain = OrderBrain(CATALOG)
+pos   = POSAdapter(PRICING)
 
-DRINKS      = list_drinks(menu)
-DRINKS_TEXT = " ; ".join(DRINKS)
+FEED = MenuFeed(CATALOG)
+OOS: Set[str] = FEED.oos
+PROMPTS = PromptBuilder(FEED)
+KITCHEN = KitchenHub()
 
-brain = OrderBrain(menu)
-pos   = POSAdapter()
-
-BY_SKU, REQUIRED_OPTIONS = build_menu_index(menu)
-OOS: Set[str] = set()
+tracer = Tracer()
 
 # --- FastAPI app ---
 app = FastAPI(
@@ -113,9 +71,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing", "X-Prompt-Bytes", "X-Prompt-Tokens", SESSION_HEADER],
 )
 print("CORS allow_origins =", origins)
 
+# --- tracing (corrélation par session, voir tracing.py) ---
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    sid = request.headers.get(SESSION_HEADER)
+    t0 = time.perf_counter()
+    if sid:
+        with tracer.request(sid, f"{request.method} {request.url.path}"):
+            response = await call_next(request)
+            tracer.annotate(status=response.status_code)
+        response.headers[SESSION_HEADER] = sid
+    else:
+        # sondes, écrans cuisine, curl : sans X-Session-Id, pas de session tracée (LRU et TRACE_FILE)
+        response = await call_next(request)
+    response.headers["Server-Timing"] = f"app;dur={(time.perf_counter() - t0) * 1000:.1f}"
+    return response
+
 # --- models ---
 class EphemeralToken(BaseModel):
     client_secret: str
@@ -126,6 +101,7 @@ class NLUIn(BaseModel):
 
 class OrderIn(BaseModel):
     order: dict
+    site: Optional[str] = None
 
 # --- health ---
 @app.get("/ping")
@@ -134,7 +110,7 @@ def ping():
 
 # --- realtime token ---
 @app.get("/token", response_model=EphemeralToken)
-def mint_ephemeral_token():
+def mint_ephemeral_token(response: Response):
     url = f"{OPENAI_BASE_URL}/v1/realtime/sessions"
     headers = {
         "Authorization": f"Bearer {OPENAI_API_KEY}",
@@ -142,28 +118,19 @@ def mint_ephemeral_token():
         "OpenAI-Beta": "realtime=v1",
     }
     temp = max(0.6, round(MODEL_TEMPERATURE + random.uniform(-TEMP_JITTER, TEMP_JITTER), 2))
-    instr = (
-        AGENT_INSTRUCTIONS.replace("{DRINKS_TEXT}", DRINKS_TEXT)
-        + "\n\nPRONONCIATION\n"
-        + "- Parle en français.\n"
-        + "- Prononce ces termes avec un accent anglais naturel (sans l'écrire différemment) : Giant, Long Bacon, Quick n Toast, Sprite, Fanta.\n"
-        + "- Ne pas afficher d'IPA ni de parenthèses dans tes phrases.\n"
-        + "\nEFFICACITE TOKENS\n"
-        + "- Réponses très courtes et concrètes. Une seule question fermée à la fois.\n"
-        + "- Évite les répétitions et les formules de politesse longues.\n"
-        + "- Ne lis pas la carte complète : propose 2–3 choix max.\n"
-        + "\nFIN DE COMMANDE\n"
-        + "- Quand ça semble fini, récapitule en 1 phrase et demande confirmation: ‘C’est tout pour vous ?’.\n"
-        + "- Après confirmation, dis exactement: ‘votre commande est en cuisine, vous pouvez avancer à la prochaine cabine pour régler. bon appétit !’.\n"
-    ).strip()
+    with tracer.span("prompt.get"):
+        prompt = PROMPTS.get()
+        tracer.annotate(prompt_bytes=prompt.bytes, prompt_tokens_est=prompt.tokens)
     payload = {
         "model": REALTIME_MODEL,
-        "instructions": instr,
+        "instructions": prompt.text,
         "voice": os.getenv("VOICE_NAME", "verse"),
         "temperature": temp,
         # pas de max_response_output_tokens → évite les phrases tronquées
     }
-    r = requests.post(url, headers=headers, json=payload, timeout=20)
+    with tracer.span("openai.realtime_session", prompt_bytes=prompt.bytes):
+        r = requests.post(url, headers=headers, json=payload, timeout=20)
+        tracer.annotate(status=r.status_code)
     if r.status_code >= 300:
         raise HTTPException(r.status_code, r.text)
     data = r.json()
@@ -172,38 +139,105 @@ def mint_ephemeral_token():
     expires = cs.get("expires_at", int(time.time()) + 60)
     if not value:
         raise HTTPException(502, f"Unexpected token response: {data}")
+    response.headers["X-Prompt-Bytes"] = str(prompt.bytes)
+    response.headers["X-Prompt-Tokens"] = str(prompt.tokens)
     return {"client_secret": value, "expires_at": expires}
 
+# --- menu (catalogue + OOS, pré-sérialisé par version) ---
+@app.get("/menu")
+def get_menu(request: Request, since: Optional[str] = None):
+    payload = FEED.since(since) if since else FEED.full()
+    use_gzip = accepts_gzip(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": payload.etag_gzip if use_gzip else payload.etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if payload.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    body = payload.body
+    if use_gzip:
+        body = payload.gzipped
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # --- OOS ---
 @app.post("/oos/{sku}")
 def set_oos(sku: str):
-    OOS.add(sku.upper())
-    return {"ok": True, "oos": sorted(list(OOS))}
+    FEED.set_oos(sku.upper(), True)
+    return {"ok": True, "oos": sorted(list(OOS)), "version": FEED.version}
 
 @app.delete("/oos/{sku}")
 def clear_oos(sku: str):
-    OOS.discard(sku.upper())
-    return {"ok": True, "oos": sorted(list(OOS))}
+    FEED.set_oos(sku.upper(), False)
+    return {"ok": True, "oos": sorted(list(OOS)), "version": FEED.version}
 
 # --- NLU & POS ---
 @app.post("/nlu")
 def nlu(in_: NLUIn):
-    order = brain.parse(in_.utterance)
-    policy_notes = analyze_utterance_flags(in_.utterance, MAX_QTY_PER_LINE)
+    with tracer.span("brain.parse", chars=len(in_.utterance)):
+        order = brain.parse_guarded(in_.utterance, MAX_UTTERANCE_CHARS, PARSE_BUDGET_MS)
+        tracer.annotate(truncated=bool(order.get("truncated")))
+    with tracer.span("policy.flags"):
+        # mêmes drapeaux que sur le texte analysé : rien ne vient d'une partie coupée de la commande
+        policy_notes = analyze_utterance_flags(cap_utterance(in_.utterance, MAX_UTTERANCE_CHARS)[0], MAX_QTY_PER_LINE)
     if isinstance(order, dict):
         order.setdefault("notes", [])
         order["notes"].extend([n for n in policy_notes if n not in order["notes"]])
-    hard_errors = validate_order(order, BY_SKU, REQUIRED_OPTIONS, OOS, MAX_QTY_PER_LINE, MAX_TOTAL_ITEMS)
-    try:
-        soft_errors = brain.validate(order)
-    except Exception:
-        soft_errors = []
+    with tracer.span("policy.validate", lines=len(order.get("lines", []))):
+        hard_errors = validate_order(order, CATALOG, OOS, MAX_QTY_PER_LINE, MAX_TOTAL_ITEMS)
+        try:
+            soft_errors = brain.validate(order)
+        except Exception:
+            soft_errors = []
     errors = list(dict.fromkeys(hard_errors + soft_errors))
-    return {"order": order, "errors": errors}
+    with tracer.span("pricing"):
+        price = PRICING.price(order)
+    return {"order": order, "errors": errors, "price": price}
+
+def known_site(site: Optional[str]) -> str:
+    site = site or SITE_ID
+    if site not in SITE_IDS:
+        raise HTTPException(status_code=422, detail={"errors": ["SITE_UNKNOWN"]})
+    return site
 
 @app.post("/pos/order")
 def push_order(in_: OrderIn):
-    errors = validate_order(in_.order, BY_SKU, REQUIRED_OPTIONS, OOS, MAX_QTY_PER_LINE, MAX_TOTAL_ITEMS)
+    site = known_site(in_.site)
+    with tracer.span("policy.validate", lines=len(in_.order.get("lines", []))):
+        errors = validate_order(in_.order, CATALOG, OOS, MAX_QTY_PER_LINE, MAX_TOTAL_ITEMS)
     if errors:
         raise HTTPException(status_code=422, detail={"errors": errors})
-    return pos.create_order(in_.order)
+    with tracer.span("pos.create_order"):
+        ticket = pos.create_order(in_.order)
+    with tracer.span("kitchen.publish"):
+        n = KITCHEN.publish(site, kitchen_ticket(in_.order, ticket, site, CATALOG))
+        tracer.annotate(subscribers=n)
+    return ticket
+
+# --- écrans cuisine (SSE) ---
+@app.get("/kitchen/stream")
+async def kitchen_stream(request: Request, site: Optional[str] = None):
+    last_id = request.headers.get("last-event-id", "")
+    sub = KITCHEN.subscribe(known_site(site), int(last_id) if last_id.isdigit() else None)
+    return StreamingResponse(
+        KITCHEN.stream(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- debug ---
+@app.get("/debug/prompt")
+def prompt_stats(text: bool = False):
+    prompt = PROMPTS.get()
+    out = prompt.stats()
+    if text:
+        out["text"] = prompt.text
+    return out
+
+@app.get("/debug/sessions/{session_id}/trace")
+def session_trace(session_id: str):
+    trace = tracer.session_trace(session_id)
+    if trace is None:
+        raise HTTPException(404, "Session inconnue ou non échantillonnée")
+    return trace
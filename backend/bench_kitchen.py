@@ -0,0 +1,86 @@
+# backend/bench_kitchen.py
+# Latence de diffusion KitchenHub : publication depuis un thread (comme /pos/order)
+# vers N écrans abonnés, dont quelques écrans volontairement lents.
+#   python bench_kitchen.py --subscribers 500 --orders 200
+import argparse, asyncio, json, threading, time
+
+from kitchen_stream import KitchenHub
+
+
+def pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def consume(hub: KitchenHub, sub, latencies, slow_s: float, expected: int):
+    seen = 0
+    async for chunk in hub.stream(sub, heartbeat=0.5):
+        now = time.perf_counter()
+        for block in chunk.split(b"\n\n"):
+            if b"event: order" not in block:
+                continue
+            data = json.loads(block.split(b"data: ", 1)[1])
+            latencies.append(now - data["t0"])
+            seen += 1
+        if slow_s:
+            await asyncio.sleep(slow_s)
+        if seen >= expected:
+            return seen
+    return seen
+
+
+async def run(n_subs: int, n_orders: int, n_slow: int, slow_s: float, rate: float):
+    hub = KitchenHub()
+    fast_lat, slow_lat = [], []
+    subs = [hub.subscribe("bench") for _ in range(n_subs)]
+    tasks = []
+    for i, sub in enumerate(subs):
+        slow = i < n_slow
+        tasks.append(asyncio.create_task(
+            consume(hub, sub, slow_lat if slow else fast_lat, slow_s if slow else 0.0, n_orders)
+        ))
+
+    publish_cost = []
+    def publisher():
+        for k in range(n_orders):
+            t = time.perf_counter()
+            hub.publish("bench", {"ticket_id": f"SIM-{k}", "lines": [{"sku": "GIANT_MENU", "qty": 1}], "t0": t})
+            publish_cost.append(time.perf_counter() - t)
+            time.sleep(1.0 / rate)
+
+    t_start = time.perf_counter()
+    th = threading.Thread(target=publisher)
+    th.start()
+    await asyncio.get_running_loop().run_in_executor(None, th.join)
+    # les écrans lents ne reçoivent pas tout (buffer borné) : on ne les attend pas
+    await asyncio.wait(tasks[n_slow:], timeout=10)
+    elapsed = time.perf_counter() - t_start
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    ms = lambda v: f"{v * 1000:.2f}ms"
+    print(f">> subscribers={n_subs} (slow={n_slow}) orders={n_orders} rate={rate}/s elapsed={elapsed:.2f}s")
+    print(f">> publish()       p50={ms(pct(publish_cost, .5))} p99={ms(pct(publish_cost, .99))} max={ms(max(publish_cost))}")
+    print(f">> fan-out (fast)  n={len(fast_lat)} p50={ms(pct(fast_lat, .5))} p99={ms(pct(fast_lat, .99))} max={ms(max(fast_lat) if fast_lat else 0)}")
+    if n_slow:
+        print(f">> fan-out (slow)  n={len(slow_lat)} (reste perdu par buffer borné, signalé par 'gap')")
+    expected = (n_subs - n_slow) * n_orders
+    print(f">> delivered to fast screens: {len(fast_lat)}/{expected}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--subscribers", type=int, default=500)
+    ap.add_argument("--orders", type=int, default=200)
+    ap.add_argument("--slow", type=int, default=5, help="écrans qui lisent lentement")
+    ap.add_argument("--slow-delay", type=float, default=0.5)
+    ap.add_argument("--rate", type=float, default=50.0, help="commandes/seconde")
+    a = ap.parse_args()
+    asyncio.run(run(a.subscribers, a.orders, a.slow, a.slow_delay, a.rate))
+
+
+if __name__ == "__main__":
+    main()
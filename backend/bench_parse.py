@@ -0,0 +1,105 @@
+# backend/bench_parse.py
+# Pire cas de /nlu sur des phrases longues ou hostiles : parse() libre vs parse_guarded(),
+# et parse_guarded() == parse() sur des commandes normales jusqu'au plafond.
+#   python bench_parse.py --max-len 1000000
+import argparse, os, random, string, time
+
+from menu_catalog import MenuCatalog
+from order_brain import OrderBrain, cap_utterance
+from policy import MAX_QTY_PER_LINE, MAX_UTTERANCE_CHARS, PARSE_BUDGET_MS, analyze_utterance_flags
+
+ROOT = os.path.dirname(__file__)
+# au-delà, parse() libre prend plusieurs secondes : on ne mesure que la version protégée
+UNGUARDED_MAX_LEN = 100_000
+
+
+def adversarial(brain: OrderBrain, rnd: random.Random):
+    """Motifs qui maximisent le nombre de scans regex par caractère."""
+    aliases = " ".join(brain.syn_items) + " "
+    return {
+        "all_aliases": aliases,                                   # chaque SKU trouvé -> scans quantité
+        "number_words": " ".join(brain.number_words) + " menus ",
+        "digit_runs": "1" * 64 + " giant ",
+        "whitespace": "giant" + " " * 256 + "x",
+        "asr_repeat": "euh je voudrais un giant menu xl avec un coca zero ",
+        "no_spaces": "giantmenuxlcoca" * 8,
+        "garbage": "".join(rnd.choice(string.ascii_lowercase + " ,.") for _ in range(512)),
+    }
+
+
+# propositions de commandes réelles, assemblées en phrases jusqu'à MAX_UTTERANCE_CHARS
+CLAUSES = (
+    "bonjour", "alors je vais prendre un long chicken menu pour moi",
+    "ensuite pour ma femme ce sera une salade poulet avec de l eau",
+    "et pour les enfants deux sundae et un brownie s il vous plait",
+    "et pour le menu ce sera en xl avec un fanta", "un giant menu sans oignons",
+    "deux cafés", "une petite salade", "trois chicken wings", "un menu kids",
+    "avec un coca zero", "des frites large", "en grande taille", "un long fish menu moyen avec un sprite",
+    "merci beaucoup et bonne journee", "euh attendez", "plutôt un mega giant menu",
+)
+
+
+def natural(rnd: random.Random, count: int):
+    yield ("bonjour, alors je vais prendre un long chicken menu pour moi, ensuite pour ma femme ce sera "
+           "une salade poulet avec de l eau, et pour les enfants deux sundae et un brownie s il vous plait, "
+           "et pour le menu ce sera en xl avec un fanta")
+    for _ in range(count):
+        parts = []
+        while True:
+            clause = rnd.choice(CLAUSES)
+            if len(", ".join(parts + [clause])) > MAX_UTTERANCE_CHARS:
+                break
+            parts.append(clause)
+            if rnd.random() < 0.1:
+                break
+        yield ", ".join(parts)
+
+
+def timed(fn, *args):
+    t = time.perf_counter()
+    out = fn(*args)
+    return (time.perf_counter() - t) * 1000, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-len", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    a = ap.parse_args()
+
+    brain = OrderBrain(MenuCatalog.load(os.path.join(ROOT, "menu.json"), os.path.join(ROOT, "prices.json")))
+    rnd = random.Random(7)
+    print(f">> MAX_UTTERANCE_CHARS={MAX_UTTERANCE_CHARS} PARSE_BUDGET_MS={PARSE_BUDGET_MS}")
+
+    # cohérence : sous le plafond, la version protégée ne change pas le résultat
+    checked = 0
+    for u in natural(rnd, 500):
+        assert brain.parse_guarded(u, MAX_UTTERANCE_CHARS, PARSE_BUDGET_MS) == brain.parse(u), u
+        checked += 1
+    print(f">> parse_guarded == parse on {checked} normal utterances (<= {MAX_UTTERANCE_CHARS} chars)")
+
+    lengths = [n for n in (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000) if n <= a.max_len]
+    worst_guarded = 0.0
+    for name, unit in adversarial(brain, rnd).items():
+        for n in lengths:
+            u = (unit * (n // len(unit) + 1))[:n]
+            free = "-"
+            if n <= UNGUARDED_MAX_LEN:
+                ms, _ = timed(brain.parse, u)
+                free = f"{ms:8.1f}ms"
+            best = []
+            for _ in range(a.repeat):
+                ms, order = timed(
+                    lambda s: (brain.parse_guarded(s, MAX_UTTERANCE_CHARS, PARSE_BUDGET_MS),
+                               analyze_utterance_flags(cap_utterance(s, MAX_UTTERANCE_CHARS)[0], MAX_QTY_PER_LINE))[0],
+                    u,
+                )
+                best.append(ms)
+            worst_guarded = max(worst_guarded, max(best))
+            print(f"{name:13s} len={n:>9,d}  parse={free:>10s}  guarded max={max(best):6.2f}ms"
+                  f"  lines={len(order['lines']):2d} truncated={bool(order.get('truncated'))}")
+    print(f">> worst guarded latency: {worst_guarded:.2f}ms (budget {PARSE_BUDGET_MS}ms)")
+
+
+if __name__ == "__main__":
+    main()
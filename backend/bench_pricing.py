@@ -0,0 +1,55 @@
+# backend/bench_pricing.py
+# Coût de PricingEngine.price sur des paniers de taille croissante + cohérence avec le POS.
+#   python bench_pricing.py --baskets 2000
+import argparse, os, random, time
+
+from menu_catalog import MenuCatalog
+from pricing import PricingEngine
+from pos_adapter import POSAdapter
+
+ROOT = os.path.dirname(__file__)
+
+
+def random_basket(catalog: MenuCatalog, n_lines: int, rnd: random.Random):
+    lines = []
+    for _ in range(n_lines):
+        it = rnd.choice(catalog.items)
+        mods = {}
+        for key, opt in it.options.items():
+            if opt.values:
+                mods[key] = rnd.choice(opt.values)
+        if it.category in ("menus", "burgers") and rnd.random() < 0.2:
+            mods["onions"] = False
+        lines.append({"sku": it.sku, "qty": rnd.randint(1, 10), "mods": mods})
+    return {"lines": lines}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--baskets", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=42)
+    a = ap.parse_args()
+
+    t = time.perf_counter()
+    catalog = MenuCatalog.load(os.path.join(ROOT, "menu.json"), os.path.join(ROOT, "prices.json"))
+    engine = PricingEngine(catalog)
+    print(f">> load catalog + pricing tables: {(time.perf_counter() - t) * 1000:.2f}ms ({len(catalog)} items)")
+
+    rnd = random.Random(a.seed)
+    pos = POSAdapter(engine)
+    for n_lines in (1, 5, 30, 300, 3000):
+        count = max(1, a.baskets // max(1, n_lines // 5))
+        baskets = [random_basket(catalog, n_lines, rnd) for _ in range(count)]
+        t = time.perf_counter()
+        for b in baskets:
+            engine.price(b)
+        per = (time.perf_counter() - t) / count
+        print(f">> lines={n_lines:5d} baskets={count:5d}  {per * 1e6:9.1f}µs/basket  {per / n_lines * 1e9:7.0f}ns/line")
+        # cohérence : le ticket POS porte le même total que /nlu
+        for b in baskets[:50]:
+            assert pos.create_order(b)["total_cents"] == engine.price(b)["total_cents"]
+    print(">> POS totals consistent with PricingEngine")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# backend/kitchen_stream.py
+from __future__ import annotations
+import os, json, time, asyncio, threading
+from collections import deque
+from typing import Dict, Any, List, Deque, Optional, AsyncIterator
+
+from menu_catalog import MenuCatalog
+
+# --- config (.env) ---
+KDS_BUFFER_MAX   = int(os.getenv("KDS_BUFFER_MAX", "64"))      # événements en attente par écran
+KDS_REPLAY_MAX   = int(os.getenv("KDS_REPLAY_MAX", "50"))      # rejoués après reconnexion (Last-Event-ID)
+KDS_HEARTBEAT_S  = float(os.getenv("KDS_HEARTBEAT_S", "15"))
+
+
+def sse_event(event_id: int, event: str, data: Dict[str, Any]) -> bytes:
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event}\ndata: {body}\n\n".encode("utf-8")
+
+
+class Subscriber:
+    """Un écran cuisine : buffer borné, un écran lent perd ses plus vieux événements
+    (signalés par un événement 'gap') sans jamais bloquer les autres."""
+    __slots__ = ("site", "buffer", "dropped", "_loop", "_wake")
+
+    def __init__(self, site: str, loop: asyncio.AbstractEventLoop, maxlen: int):
+        self.site = site
+        self.buffer: Deque[bytes] = deque(maxlen=maxlen)
+        self.dropped = 0
+        self._loop = loop
+        self._wake = asyncio.Event()
+
+    def push(self, chunk: bytes) -> None:
+        # appelé sous le verrou du hub, depuis n'importe quel thread
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(chunk)
+        if self._wake.is_set():
+            return  # réveil déjà programmé, le lecteur videra tout le buffer
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            pass  # boucle fermée : l'abonné sera retiré à la fin de son stream
+
+    async def wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+
+class KitchenHub:
+    """Diffusion des commandes validées vers les écrans cuisine (SSE), par site.
+    Chaque commande est sérialisée une seule fois puis référencée par tous les buffers."""
+
+    def __init__(self, buffer_max: int = KDS_BUFFER_MAX, replay_max: int = KDS_REPLAY_MAX):
+        self.buffer_max = buffer_max
+        self.replay_max = replay_max
+        self._subs: Dict[str, List[Subscriber]] = {}
+        self._replay: Dict[str, Deque[tuple]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, site: str, last_event_id: Optional[int] = None) -> Subscriber:
+        sub = Subscriber(site, asyncio.get_running_loop(), self.buffer_max)
+        with self._lock:
+            if last_event_id is not None:
+                for eid, chunk in self._replay.get(site, ()):
+                    if eid > last_event_id:
+                        sub.push(chunk)
+            self._subs.setdefault(site, []).append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.site, [])
+            if sub in subs:
+                subs.remove(sub)
+            if not subs:
+                self._subs.pop(sub.site, None)
+
+    def subscribers(self, site: str) -> int:
+        with self._lock:
+            return len(self._subs.get(site, ()))
+
+    def publish(self, site: str, data: Dict[str, Any], event: str = "order") -> int:
+        """Retourne le nombre d'écrans notifiés."""
+        with self._lock:
+            self._next_id += 1
+            chunk = sse_event(self._next_id, event, data)
+            replay = self._replay.setdefault(site, deque(maxlen=self.replay_max))
+            replay.append((self._next_id, chunk))
+            subs = self._subs.get(site, ())
+            for sub in subs:
+                sub.push(chunk)
+            return len(subs)
+
+    async def stream(self, sub: Subscriber, heartbeat: float = KDS_HEARTBEAT_S) -> AsyncIterator[bytes]:
+        """Générateur SSE d'un abonné ; se désabonne à la déconnexion."""
+        try:
+            yield b"retry: 2000\n\n"
+            while True:
+                await sub.wait(heartbeat)
+                with self._lock:
+                    chunks = list(sub.buffer)
+                    sub.buffer.clear()
+                    dropped, sub.dropped = sub.dropped, 0
+                if dropped:
+                    yield f"event: gap\ndata: {json.dumps({'dropped': dropped})}\n\n".encode("utf-8")
+                if chunks:
+                    yield b"".join(chunks)
+                else:
+                    yield b": ping\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+
+def kitchen_ticket(order: Dict[str, Any], ticket: Dict[str, Any], site: str,
+                   catalog: MenuCatalog) -> Dict[str, Any]:
+    """Charge utile envoyée aux écrans : lignes, mods, ticket POS et noms lisibles."""
+    lines = []
+    for l in order.get("lines", []):
+        sku = (l.get("sku") or "").upper()
+        item = catalog.get(sku)
+        lines.append({
+            "sku": sku,
+            "name": item.name if item else sku,
+            "qty": l.get("qty", 1),
+            "mods": l.get("mods", {}),
+        })
+    return {
+        "site": site,
+        "ticket_id": ticket.get("ticket_id"),
+        "items": ticket.get("items"),
+        "lines": lines,
+        "ts": time.time(),
+    }
@@ -0,0 +1,151 @@
+# backend/menu_catalog.py
+from __future__ import annotations
+import os, json, hashlib, sys
+from types import MappingProxyType
+from typing import Dict, Any, List, Tuple, Mapping, Optional
+
+# options qui doivent être précisées avant l'envoi en cuisine
+REQUIRED_OPTION_KEYS = ("size", "drink", "fries")
+DRINK_CATEGORIES = ("cold_drinks", "hot_drinks")
+
+
+class MenuOption:
+    __slots__ = ("key", "type", "values", "default", "surcharges", "includes")
+
+    def __init__(self, key: str, type: str, values: Tuple[str, ...], default: Any,
+                 surcharges: Mapping[str, int],
+                 includes: Optional[Mapping[str, Mapping[str, str]]] = None):
+        self.key = key
+        self.type = type
+        self.values = values
+        self.default = default
+        self.surcharges = surcharges  # valeur -> supplément en centimes
+        # valeur -> options offertes avec elle (ex. size XL -> fries L, déjà compris dans le supplément XL)
+        self.includes = includes or MappingProxyType({})
+
+    def to_dict(self) -> Dict[str, Any]:
+        d: Dict[str, Any] = {"type": self.type, "default": self.default}
+        if self.values:
+            d["values"] = list(self.values)
+        if self.surcharges:
+            d["surcharges"] = dict(self.surcharges)
+        if self.includes:
+            d["includes"] = {v: dict(inc) for v, inc in self.includes.items()}
+        return d
+
+
+class MenuItem:
+    __slots__ = ("sku", "name", "category", "options", "required", "price")
+
+    def __init__(self, sku: str, name: str, category: str,
+                 options: Mapping[str, MenuOption], required: Tuple[str, ...],
+                 price: Optional[int] = None):
+        self.sku = sku
+        self.name = name
+        self.category = category
+        self.options = options
+        self.required = required
+        self.price = price  # centimes, None si non tarifé
+
+    def option_values(self, key: str) -> Tuple[str, ...]:
+        opt = self.options.get(key)
+        return opt.values if opt else ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        d: Dict[str, Any] = {"name": self.name, "category": self.category, "sku": self.sku}
+        if self.price is not None:
+            d["price"] = self.price
+        if self.options:
+            d["options"] = {k: o.to_dict() for k, o in self.options.items()}
+        return d
+
+
+class MenuCatalog:
+    """Menu indexé une seule fois par worker, partagé par OrderBrain, policy et app.
+    Immuable : un rechargement = construire un nouveau catalogue et échanger la référence."""
+
+    __slots__ = ("version", "currency", "categories", "items", "by_sku", "by_name", "by_cat", "drinks")
+
+    def __init__(self, menu: Dict[str, Any], prices: Optional[Dict[str, Any]] = None):
+        prices = prices or {}
+        item_prices: Dict[str, int] = prices.get("items", {})
+        option_prices: Dict[str, Dict[str, int]] = prices.get("options", {})
+        option_included: Dict[str, Dict[str, Dict[str, str]]] = prices.get("included", {})
+        values_pool: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        surcharge_pool: Dict[str, Mapping[str, int]] = {}
+        includes_pool: Dict[str, Mapping[str, Mapping[str, str]]] = {}
+        items: List[MenuItem] = []
+        by_sku: Dict[str, MenuItem] = {}
+        by_name: Dict[str, MenuItem] = {}
+        by_cat: Dict[str, List[MenuItem]] = {}
+
+        for it in menu.get("items", []):
+            sku = it.get("sku")
+            if not sku:
+                continue
+            options: Dict[str, MenuOption] = {}
+            for key, spec in (it.get("options") or {}).items():
+                vals = tuple(sys.intern(str(v)) for v in spec.get("values", []))
+                # les menus partagent les mêmes listes de valeurs : une seule copie
+                vals = values_pool.setdefault(vals, vals)
+                if key not in surcharge_pool:
+                    surcharge_pool[key] = MappingProxyType(
+                        {sys.intern(str(v)): int(c) for v, c in option_prices.get(key, {}).items() if c}
+                    )
+                    includes_pool[key] = MappingProxyType({
+                        sys.intern(str(v)): MappingProxyType({k2: str(v2) for k2, v2 in inc.items()})
+                        for v, inc in option_included.get(key, {}).items()
+                    })
+                options[sys.intern(key)] = MenuOption(
+                    sys.intern(key), sys.intern(spec.get("type", "enum")), vals, spec.get("default"),
+                    surcharge_pool[key], includes_pool[key],
+                )
+            req = tuple(k for k in REQUIRED_OPTION_KEYS if k in options)
+            item = MenuItem(
+                sys.intern(sku), it.get("name") or sku, sys.intern(it.get("category") or ""),
+                MappingProxyType(options), req, item_prices.get(sku),
+            )
+            items.append(item)
+            by_sku[item.sku] = item
+            by_name[item.name.lower()] = item
+            by_cat.setdefault(item.category, []).append(item)
+
+        self.version = hashlib.sha1(
+            json.dumps([menu, prices], sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:12]
+        self.currency = prices.get("currency", "EUR")
+        self.categories = tuple(
+            (c.get("id"), c.get("name")) for c in menu.get("categories", []) if c.get("id")
+        )
+        self.items = tuple(items)
+        self.by_sku: Mapping[str, MenuItem] = MappingProxyType(by_sku)
+        self.by_name: Mapping[str, MenuItem] = MappingProxyType(by_name)
+        self.by_cat: Mapping[str, Tuple[MenuItem, ...]] = MappingProxyType(
+            {c: tuple(v) for c, v in by_cat.items()}
+        )
+        self.drinks = tuple(sorted({
+            i.name for c in DRINK_CATEGORIES for i in self.by_cat.get(c, ())
+        }))
+
+    @classmethod
+    def load(cls, path: str, prices_path: Optional[str] = None) -> "MenuCatalog":
+        with open(path, "r", encoding="utf-8") as f:
+            menu = json.load(f)
+        prices = None
+        if prices_path and os.path.exists(prices_path):
+            with open(prices_path, "r", encoding="utf-8") as f:
+                prices = json.load(f)
+        return cls(menu, prices)
+
+    def get(self, sku: str) -> Optional[MenuItem]:
+        return self.by_sku.get(sku)
+
+    def category_of(self, sku: str) -> Optional[str]:
+        it = self.by_sku.get(sku)
+        return it.category if it else None
+
+    def __contains__(self, sku: object) -> bool:
+        return sku in self.by_sku
+
+    def __len__(self) -> int:
+        return len(self.items)
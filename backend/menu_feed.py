@@ -0,0 +1,154 @@
+# backend/menu_feed.py
+from __future__ import annotations
+import json, gzip, hashlib, threading
+from typing import Dict, Any, List, Tuple, Set, FrozenSet, Optional
+
+from menu_catalog import MenuCatalog
+
+# nombre de changements OOS gardés pour les réponses ?since= (au-delà -> menu complet)
+OOS_HISTORY_MAX = 256
+# réponses delta gardées en cache (une par version cliente récente)
+DELTA_CACHE_MAX = 64
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """True si Accept-Encoding autorise gzip (q > 0), explicitement ou via '*'."""
+    gzip_q: Optional[float] = None
+    star_q: Optional[float] = None
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.partition("=")
+            if k.strip().lower() == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if coding in ("gzip", "x-gzip"):
+            gzip_q = q
+        elif coding == "*":
+            star_q = q
+    if gzip_q is not None:
+        return gzip_q > 0
+    return star_q is not None and star_q > 0
+
+
+class MenuPayload:
+    """Réponse /menu pré-sérialisée : corps JSON, version gzip et un ETag fort par codage."""
+    __slots__ = ("body", "gzipped", "etag", "etag_gzip")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.body = json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+        digest = hashlib.sha1(self.body).hexdigest()[:20]
+        self.etag = f'"{digest}"'
+        self.etag_gzip = f'"{digest}-gz"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Même contenu sous l'un ou l'autre codage : les deux ETags valident."""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return self.etag in tags or self.etag_gzip in tags
+
+
+class MenuFeed:
+    """Catalogue + état OOS versionnés pour GET /menu.
+    Version = "<version catalogue>.<compteur OOS>" ; chaque version n'est sérialisée qu'une fois."""
+
+    def __init__(self, catalog: MenuCatalog):
+        self.catalog = catalog
+        self.oos: Set[str] = set()
+        self.oos_version = 0
+        self._history: List[Tuple[int, str]] = []  # (oos_version après changement, sku)
+        self._full: Optional[MenuPayload] = None
+        self._deltas: Dict[str, MenuPayload] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> str:
+        return f"{self.catalog.version}.{self.oos_version}"
+
+    # -------------------- OOS --------------------
+
+    def set_oos(self, sku: str, oos: bool) -> bool:
+        """Retourne True si l'état a réellement changé (nouvelle version)."""
+        with self._lock:
+            if (sku in self.oos) == oos:
+                return False
+            if oos:
+                self.oos.add(sku)
+            else:
+                self.oos.discard(sku)
+            self.oos_version += 1
+            self._history.append((self.oos_version, sku))
+            if len(self._history) > OOS_HISTORY_MAX:
+                del self._history[: len(self._history) - OOS_HISTORY_MAX]
+            self._full = None
+            self._deltas.clear()
+            return True
+
+    def oos_state(self) -> Tuple[int, FrozenSet[str]]:
+        with self._lock:
+            return self.oos_version, frozenset(self.oos)
+
+    # -------------------- payloads --------------------
+
+    def full(self) -> MenuPayload:
+        with self._lock:
+            return self._full_locked()
+
+    def since(self, since: Optional[str]) -> MenuPayload:
+        """Delta depuis une version cliente ; menu complet si la version est inconnue ou trop ancienne."""
+        with self._lock:
+            cached = self._deltas.get(since) if since else None
+            if cached is not None:
+                return cached
+            changed = self._changed_since(since)
+            if changed is None:
+                return self._full_locked()
+            cached = MenuPayload({
+                "version": self.version,
+                "full": False,
+                "since": since,
+                "oos_added": sorted(s for s in changed if s in self.oos),
+                "oos_removed": sorted(s for s in changed if s not in self.oos),
+            })
+            if len(self._deltas) >= DELTA_CACHE_MAX:
+                self._deltas.pop(next(iter(self._deltas)))
+            self._deltas[since] = cached
+            return cached
+
+    def _full_locked(self) -> MenuPayload:
+        if self._full is None:
+            self._full = MenuPayload({
+                "version": self.version,
+                "full": True,
+                "categories": [{"id": cid, "name": name} for cid, name in self.catalog.categories],
+                "items": [it.to_dict() for it in self.catalog.items],
+                "oos": sorted(self.oos),
+            })
+        return self._full
+
+    def _changed_since(self, since: Optional[str]) -> Optional[Set[str]]:
+        if not since:
+            return None
+        menu_v, _, oos_v = since.rpartition(".")
+        if menu_v != self.catalog.version or not oos_v.isdigit():
+            return None
+        n = int(oos_v)
+        if n > self.oos_version:
+            return None
+        oldest = self._history[0][0] if self._history else self.oos_version + 1
+        if n + 1 < oldest:
+            return None  # historique tronqué
+        # un SKU basculé deux fois revient à son état initial côté client
+        flips: Dict[str, int] = {}
+        for v, sku in self._history:
+            if v > n:
+                flips[sku] = flips.get(sku, 0) + 1
+        return {s for s, k in flips.items() if k % 2 == 1}
@@ -1,16 +1,30 @@
 from __future__ import annotations
-import re
+import re, time
 from typing import Dict, Any, List, Tuple
 
+from menu_catalog import MenuCatalog
+
+# pré-coupe du texte brut avant normalisation, en multiple du plafond : borne le coût de lower()/split()
+PRECUT_FACTOR = 4
+
+
+def cap_utterance(utterance: str, max_chars: int) -> Tuple[str, bool]:
+    """Texte réellement analysé en mode protégé : minuscules, espaces normalisés, coupé à max_chars
+    au dernier mot entier. Retourne (texte, coupé ?) ; /nlu y applique aussi les drapeaux policy."""
+    raw = (utterance or "")[: max_chars * PRECUT_FACTOR]
+    u = " ".join(raw.lower().split())
+    cut = len(raw) < len(utterance or "") or len(u) > max_chars
+    if len(u) > max_chars:
+        u = u[:max_chars]
+        if " " in u:
+            u = u.rsplit(" ", 1)[0]
+    return u, cut
+
+
 class OrderBrain:
-    def __init__(self, menu: Dict[str, Any]):
-        self.menu = menu
-        self.by_sku = {i["sku"]: i for i in menu["items"]}
-        self.by_name = {i["name"].lower(): i for i in menu["items"]}
-        # index par catégorie
-        self.by_cat = {}
-        for it in menu["items"]:
-            self.by_cat.setdefault(it["category"], []).append(it)
+    def __init__(self, catalog: MenuCatalog):
+        # index partagés avec policy/app (voir menu_catalog.py)
+        self.catalog = catalog
 
         # synonymes FR simples -> SKU / valeurs d'options
         self.syn_items = {
@@ -107,7 +121,52 @@ class OrderBrain:
         """
         u = (utterance or "").lower()
         order: Dict[str, Any] = {"lines": [], "notes": []}
+        self._parse_into(order, u)
+
+        # 9) upsell systématique (1 seule suggestion)
+        upsell = self._upsell(order)
+        if upsell:
+            order["notes"].append(upsell)
+
+        return order
 
+    def parse_guarded(self, utterance: str, max_chars: int, budget_ms: float) -> Dict[str, Any]:
+        """
+        Comme parse(), en temps borné pour les phrases longues ou hostiles (ASR bloqué, copier-coller) :
+        - texte de cap_utterance() (espaces normalisés, coupé à max_chars au dernier mot entier) : ce plafond borne
+          le coût, et le texte retenu est analysé d'un bloc comme par parse() (même contexte pour
+          taille, boisson et options, quel que soit l'endroit de la phrase où elles sont dites) ;
+        - scans de quantité (un par SKU reconnu) arrêtés dès que le temps CPU du thread dépasse budget_ms.
+        Si le texte a été coupé ou l'analyse interrompue : order["truncated"] = True
+        et la note UTTERANCE_TRUNCATED ; les lignes déjà reconnues sont conservées.
+        """
+        deadline = time.thread_time() + budget_ms / 1000.0
+        u, truncated = cap_utterance(utterance, max_chars)
+
+        order: Dict[str, Any] = {"lines": [], "notes": []}
+        if self._parse_into(order, u, deadline):
+            truncated = True
+
+        upsell = self._upsell(order)
+        if upsell:
+            order["notes"].append(upsell)
+        if truncated:
+            order["truncated"] = True
+            order["notes"].append("UTTERANCE_TRUNCATED")
+        return order
+
+    def validate(self, order: Dict[str, Any]) -> List[str]:
+        errs = []
+        for l in order.get("lines", []):
+            if l["sku"] not in self.catalog:
+                errs.append(f"SKU inconnu: {l['sku']}")
+        return errs
+
+    # -------------------- HELPERS --------------------
+
+    def _parse_into(self, order: Dict[str, Any], u: str, deadline: float | None = None) -> bool:
+        """Étapes 1–8 de parse() sur un texte déjà en minuscules.
+        Retourne True si deadline (time.thread_time()) a interrompu la construction des lignes."""
         # 1) détecter si la personne parle d'un MENU ou d'un BURGER seul
         mentions_menu = ("menu" in u) or ("menus" in u)
 
@@ -129,26 +188,29 @@ class OrderBrain:
             order["notes"].append(guide)
 
         # 7) Construire les lignes
-        for sku in found_skus:
+        interrupted = False
+        for i, sku in enumerate(found_skus):
+            if i and deadline is not None and time.thread_time() > deadline:
+                # budget épuisé : on garde les lignes déjà construites
+                interrupted = True
+                break
             qty = self._guess_qty(u, sku) or 1
             line = {"sku": sku, "qty": qty, "mods": {}}
-            cat = self.by_sku.get(sku, {}).get("category")
+            item = self.catalog.get(sku)
+            cat = item.category if item else None
 
             if cat == "menus":
                 # options par défaut depuis menu.json si disponibles
-                opts = self.by_sku[sku].get("options", {})
                 # taille
-                if size and "size" in opts:
-                    if size in opts["size"]["values"]:
+                if size and "size" in item.options:
+                    if size in item.option_values("size"):
                         line["mods"]["size"] = size
                     # frites grandes si XL
-                    if size == "XL" and "fries" in opts:
-                        if "L" in opts["fries"]["values"]:
-                            line["mods"]["fries"] = "L"
+                    if size == "XL" and "L" in item.option_values("fries"):
+                        line["mods"]["fries"] = "L"
                 # boisson
-                if drink and "drink" in opts:
-                    if drink in opts["drink"]["values"]:
-                        line["mods"]["drink"] = drink
+                if drink and drink in item.option_values("drink"):
+                    line["mods"]["drink"] = drink
                 # oignons (si le menu supporte)
                 if no_onions:
                     # on ne sait pas quel sandwich exact dans le menu => note
@@ -161,31 +223,16 @@ class OrderBrain:
             order["lines"].append(line)
 
         # 8) si on a parlé frites/boisson seules
-        if "frites" in u and not any(self.by_sku.get(l["sku"],{}).get("category")=="fries" for l in order["lines"]):
+        if "frites" in u and not any(self.catalog.category_of(l["sku"])=="fries" for l in order["lines"]):
             order["lines"].append({"sku":"FRIES_M","qty":1,"mods":{}})
-        if ("eau" in u or "coca" in u or "fanta" in u or "sprite" in u) and not any(self.by_sku.get(l["sku"],{}).get("category")=="cold_drinks" for l in order["lines"]):
+        if ("eau" in u or "coca" in u or "fanta" in u or "sprite" in u) and not any(self.catalog.category_of(l["sku"])=="cold_drinks" for l in order["lines"]):
             if drink == "Eau":
                 order["lines"].append({"sku":"WATER","qty":1,"mods":{}})
             elif drink == "Coca-Cola":
                 order["lines"].append({"sku":"COKE_M","qty":1,"mods":{}})
             elif drink == "Fanta":
                 order["lines"].append({"sku":"FANTA","qty":1,"mods":{}})
-
-        # 9) upsell systématique (1 seule suggestion)
-        upsell = self._upsell(order)
-        if upsell:
-            order["notes"].append(upsell)
-
-        return order
-
-    def validate(self, order: Dict[str, Any]) -> List[str]:
-        errs = []
-        for l in order.get("lines", []):
-            if l["sku"] not in self.by_sku:
-                errs.append(f"SKU inconnu: {l['sku']}")
-        return errs
-
-    # -------------------- HELPERS --------------------
+        return interrupted
 
     def _detect_items(self, u: str, prefer_menu: bool) -> List[str]:
         skus: List[str] = []
@@ -196,13 +243,13 @@ class OrderBrain:
                 # si on dit "menu" sans préciser -> favoriser la version MENU si elle existe
                 if prefer_menu and not sku.endswith("_MENU"):
                     # tenter de trouver la version menu correspondante dans items
-                    name = self.by_sku.get(sku, {}).get("name", "")
-                    cand = (name + " Menu").lower()
-                    if cand in self.by_name:
-                        skus.append(self.by_name[cand]["sku"])
+                    base = self.catalog.get(sku)
+                    cand = ((base.name if base else "") + " Menu").lower()
+                    if cand in self.catalog.by_name:
+                        skus.append(self.catalog.by_name[cand].sku)
                         continue
                     # fallback: suffixer
-                    if (sku + "_MENU") in self.by_sku:
+                    if (sku + "_MENU") in self.catalog:
                         skus.append(sku + "_MENU")
                         continue
                 skus.append(sku)
@@ -210,7 +257,7 @@ class OrderBrain:
         # 2) si aucun alias n’a matché mais on a dit juste “menu”
         if not skus and prefer_menu:
             # proposer top seller menu (Giant Menu si présent)
-            if "GIANT_MENU" in self.by_sku:
+            if "GIANT_MENU" in self.catalog:
                 skus.append("GIANT_MENU")
 
         # dédoublonner en gardant l’ordre
@@ -258,8 +305,7 @@ class OrderBrain:
                 if re.search(rf"\b{w}\s+{a_esc}\b", u):
                     return n
         # 2) generic 'deux menus' when sku is a menu
-        cat = self.by_sku.get(sku, {}).get("category")
-        if cat == "menus":
+        if self.catalog.category_of(sku) == "menus":
             m = re.search(r"\b(\d+)\s+menus?\b", u)
             if m:
                 try:
@@ -300,11 +346,11 @@ class OrderBrain:
     # ---- Upsell : 1 seule suggestion pertinente
     def _upsell(self, order: Dict[str, Any]) -> str:
         lines = order.get("lines", [])
-        cats = [self.by_sku[l["sku"]]["category"] for l in lines if l["sku"] in self.by_sku]
+        cats = [self.catalog.category_of(l["sku"]) for l in lines]
 
         has_menu = any(c == "menus" for c in cats)
-        has_dessert = any(self.by_sku[l["sku"]]["category"] == "desserts" for l in lines)
-        has_side = any(self.by_sku[l["sku"]]["category"] in ("fries", "finger") for l in lines)
+        has_dessert = any(c == "desserts" for c in cats)
+        has_side = any(c in ("fries", "finger") for c in cats)
 
         if has_menu:
             if not has_dessert:
@@ -312,8 +358,8 @@ class OrderBrain:
             if not has_side:
                 return "Souhaitez-vous ajouter un accompagnement ? *Frites L* ou *Chicken Dips* ?"
             # sinon proposer XL si pas déjà demandé
-            for l in lines:
-                if self.by_sku[l["sku"]]["category"] == "menus":
+            for l, c in zip(lines, cats):
+                if c == "menus":
                     if l.get("mods", {}).get("size") != "XL":
                         return "Vous préférez **XL** pour la boisson et les frites ?"
             return ""
@@ -1,32 +1,21 @@
 # backend/policy.py
 import os, re
-from typing import Dict, Any, Tuple, Set, List
+from typing import Dict, Any, Set, List
+
+from menu_catalog import MenuCatalog
 
 # --- limits (config .env) ---
 MAX_QTY_PER_LINE = int(os.getenv("MAX_QTY_PER_LINE", "10"))
 MAX_TOTAL_ITEMS  = int(os.getenv("MAX_TOTAL_ITEMS", "30"))
+# analyse /nlu protégée : longueur max analysée et budget CPU par requête
+MAX_UTTERANCE_CHARS = int(os.getenv("MAX_UTTERANCE_CHARS", "500"))
+PARSE_BUDGET_MS     = float(os.getenv("PARSE_BUDGET_MS", "50"))
 
 PROFANITY_FR = [
     "connard", "conne", "fdp", "nique ta", "salope", "va te faire", "merde",
     "pute", "enculé", "encule", "ta gueule", "gros con"
 ]
 
-def build_menu_index(menu: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
-    by_sku: Dict[str, Any] = {}
-    required: Dict[str, List[str]] = {}
-    for it in menu.get("items", []):
-        sku = it.get("sku")
-        if not sku: continue
-        by_sku[sku] = it
-        opts = it.get("options", {})
-        req = []
-        for k in ["size", "drink", "fries"]:
-            if k in opts:
-                req.append(k)
-        if req:
-            required[sku] = req
-    return by_sku, required
-
 def analyze_utterance_flags(utterance: str, max_qty_per_line: int) -> List[str]:
     notes: List[str] = []
     u = (utterance or "").lower()
@@ -47,8 +36,7 @@ def _total_items(order: Dict[str, Any]) -> int:
 
 def validate_order(
     order: Dict[str, Any],
-    by_sku: Dict[str, Any],
-    required_options: Dict[str, List[str]],
+    catalog: MenuCatalog,
     oos: Set[str],
     max_qty_per_line: int,
     max_total_items: int
@@ -58,7 +46,8 @@ def validate_order(
     for l in lines:
         sku = (l.get("sku") or "").upper()
         qty = int(l.get("qty", 1))
-        if sku not in by_sku:
+        item = catalog.get(sku)
+        if item is None:
             errors.append(f"POLICY_SKU_UNKNOWN:{sku}")
             continue
         if qty <= 0:
@@ -67,9 +56,8 @@ def validate_order(
             errors.append(f"POLICY_QTY_TOO_HIGH:{sku}:{qty} (max {max_qty_per_line})")
         if sku in oos:
             errors.append(f"POLICY_OOS:{sku}")
-        req = required_options.get(sku, [])
         mods = l.get("mods", {})
-        for opt in req:
+        for opt in item.required:
             if opt not in mods or str(mods.get(opt, "")).strip() == "":
                 errors.append(f"POLICY_CLARIFY_OPTION:{sku}.{opt}")
     total = _total_items(order)
@@ -1,13 +1,24 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from pricing import PricingEngine
 
 class POSAdapter:
     """Swap this mock with Merim POS write APIs."""
 
+    def __init__(self, pricing: Optional[PricingEngine] = None):
+        # même moteur que /nlu : le montant annoncé au client = montant du ticket
+        self.pricing = pricing
+
     def create_order(self, order: Dict[str, Any]) -> Dict[str, Any]:
         # TODO: map to Merim payload (site_id, kiosk_id, cashier_id, etc.)
         # For now, return a fake ticket id
         total_items = sum(l.get("qty", 1) for l in order.get("lines", []))
-        return {
+        ticket = {
             "ticket_id": "SIM-" + str(abs(hash(str(order))) % 10_000),
             "items": total_items,
         }
+        if self.pricing is not None:
+            price = self.pricing.price(order)
+            ticket["total_cents"] = price["total_cents"]
+            ticket["currency"] = price["currency"]
+        return ticket
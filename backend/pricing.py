@@ -0,0 +1,81 @@
+# backend/pricing.py
+from __future__ import annotations
+from typing import Dict, Any, List, Tuple, Optional
+
+from menu_catalog import MenuCatalog
+
+
+class PricingEngine:
+    """Totaux de commande en centimes à partir des tables pré-calculées au chargement du menu :
+    prix de base par SKU et suppléments par (option, valeur). Une option comprise dans une autre
+    (prices.json "included", ex. frites L avec la taille XL) n'est pas facturée deux fois.
+    Utilisé par /nlu et par le POS, donc un seul calcul fait foi."""
+
+    def __init__(self, catalog: MenuCatalog):
+        self.catalog = catalog
+        self.currency = catalog.currency
+        self._base: Dict[str, int] = {}
+        self._mods: Dict[str, Dict[Tuple[str, str], int]] = {}
+        # (option, valeur) -> options offertes, seulement si elles ont un supplément à annuler
+        self._included: Dict[str, Dict[Tuple[str, str], Tuple[Tuple[str, str], ...]]] = {}
+        shared: Dict[Tuple, Dict[Tuple[str, str], int]] = {}
+        shared_inc: Dict[Tuple, Dict[Tuple[str, str], Tuple[Tuple[str, str], ...]]] = {}
+        for it in catalog.items:
+            if it.price is None:
+                continue
+            self._base[it.sku] = it.price
+            table = {
+                (key, value): cents
+                for key, opt in it.options.items()
+                for value, cents in opt.surcharges.items()
+            }
+            if table:
+                # les menus ont les mêmes suppléments : une seule table partagée
+                sig = tuple(sorted(table.items()))
+                self._mods[it.sku] = shared.setdefault(sig, table)
+            included = {}
+            for key, opt in it.options.items():
+                for value, inc in opt.includes.items():
+                    waived = tuple((k2, v2) for k2, v2 in inc.items() if (k2, v2) in table)
+                    if waived:
+                        included[(key, value)] = waived
+            if included:
+                sig = tuple(sorted(included.items()))
+                self._included[it.sku] = shared_inc.setdefault(sig, included)
+
+    def unit_price(self, sku: str, mods: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        base = self._base.get(sku)
+        if base is None:
+            return None
+        if mods:
+            table = self._mods.get(sku)
+            if table:
+                for k, v in mods.items():
+                    base += table.get((k, str(v)), 0)
+                included = self._included.get(sku)
+                if included:
+                    for k, v in mods.items():
+                        for k2, v2 in included.get((k, str(v)), ()):
+                            if k2 in mods and str(mods[k2]) == v2:
+                                base -= table[(k2, v2)]
+        return base
+
+    def price(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        """{"currency", "total_cents", "lines": [centimes|None, ...], "unpriced": [sku, ...]}"""
+        total = 0
+        lines: List[Optional[int]] = []
+        unpriced: List[str] = []
+        for l in order.get("lines", []):
+            sku = (l.get("sku") or "").upper()
+            unit = self.unit_price(sku, l.get("mods"))
+            if unit is None:
+                unpriced.append(sku)
+                lines.append(None)
+                continue
+            try:
+                qty = max(0, int(l.get("qty", 1)))
+            except (TypeError, ValueError):
+                qty = 0
+            lines.append(unit * qty)
+            total += unit * qty
+        return {"currency": self.currency, "total_cents": total, "lines": lines, "unpriced": unpriced}
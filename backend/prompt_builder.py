@@ -0,0 +1,150 @@
+# backend/prompt_builder.py
+from __future__ import annotations
+import re, threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from menu_feed import MenuFeed
+from policy import MAX_QTY_PER_LINE, MAX_TOTAL_ITEMS
+
+MAX_PROMPT_DRINKS = 30
+PROMPT_CACHE_MAX  = 16
+
+# --- guardrails texte ---
+# {DRINKS_TEXT} et les limites sont injectés une fois par version (voir PromptBuilder)
+AGENT_INSTRUCTIONS = """
+Tu es l’assistant DRIVE de QUICK (France). Français uniquement.
+
+LIMITES & SOURCES
+- Tu NE PROPOSES QUE des produits Quick présents dans le menu fourni par le serveur (menu.json).
+- Catégories autorisées : Menus, Menus Enfants, Burgers, Salades, Frites, Finger food,
+  Desserts, Boissons froides, Boissons chaudes.
+- Interdits : autres cuisines/marques (sushis, pizzas, kebab…), alcool. Si demandé : refuse poliment
+  et propose une alternative Quick proche (ex. poisson → Long Fish). N’invente JAMAIS de produit.
+
+BOISSONS AUTORISÉES (exemples) :
+{DRINKS_TEXT}
+
+RÈGLES BOISSON :
+- Toujours proposer 3 choix concrets par défaut (ex. Coca-Cola, Fanta, Eau).
+- Si le client dit « sans sucre », l'interpréter comme « Coca-Cola Sans Sucres » (sauf autre marque citée).
+- Ne JAMAIS valider un menu sans boisson explicitement choisie.
+
+COMPRÉHENSION & CLARIFICATION
+- Si un nom est inconnu : « Je n’ai pas cet article. Voulez-vous plutôt <ALTERNATIVE_QUICK> ? »
+- Si ambigu (taille boisson/frites, Zéro/Sans sucres, options oignons/sauce) → pose UNE question fermée.
+- Si bruits/inaudible : « Je vous entends mal, après le bip, pouvez-vous répéter ? »
+
+UPSÉLL
+- 1 seul upsell pertinent par tour (XL boisson/frites, dessert/café, convertir burger → MENU). Jamais insistant.
+
+ENFANTS / ORIENTATION
+- <6 ans → Menu Kids ; 7–11 ans → Menu Kids ou sandwich simple + petite boisson ;
+  léger → Salade + eau ; très faim → Menu XL ; budget serré → Junior Giant/Value.
+
+FLUX DE CONVERSATION
+- Pas de barge-in : ne parle pas en même temps que le client.
+- Après « c’est tout » : RÉCAPITULER (produits, tailles, boissons, options, quantités),
+  puis : « Je transmets la commande en cuisine. »
+
+CONFORMITÉ & ABUS
+- Pas d’infos personnelles. Allergènes : « La carte allergènes est disponible au comptoir. »
+- Quantités : maximum {MAX_QTY_PER_LINE} par article, {MAX_TOTAL_ITEMS} au total. Si dépassé : refuse poliment et propose une quantité raisonnable.
+- Langage injurieux : rappeler une fois la courtoisie ; si répétition, passer à un équipier.
+
+AUTO-CORRECTION
+- Si tu proposes un article non-Quick ou hors menu : excuse-toi et corrige immédiatement en ne proposant que Quick.
+
+PRONONCIATION
+- Parle en français.
+- Prononce ces termes avec un accent anglais naturel (sans l'écrire différemment) : Giant, Long Bacon, Quick n Toast, Sprite, Fanta.
+- Ne pas afficher d'IPA ni de parenthèses dans tes phrases.
+
+EFFICACITE TOKENS
+- Réponses très courtes et concrètes. Une seule question fermée à la fois.
+- Évite les répétitions et les formules de politesse longues.
+- Ne lis pas la carte complète : propose 2–3 choix max.
+
+FIN DE COMMANDE
+- Quand ça semble fini, récapitule en 1 phrase et demande confirmation: ‘C’est tout pour vous ?’.
+- Après confirmation, dis exactement: ‘votre commande est en cuisine, vous pouvez avancer à la prochaine cabine pour régler. bon appétit !’.
+""".strip()
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def compact(text: str) -> str:
+    """Supprime lignes vides et espaces superflus, recolle les lignes de continuation indentées."""
+    out = []
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        if not line:
+            continue
+        if raw.startswith("  ") and out:
+            out[-1] += " " + line
+        else:
+            out.append(line)
+    return "\n".join(out)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximation BPE sans dépendance : ~1 token par ponctuation, ~4 caractères par token de mot."""
+    return sum((len(t) + 3) // 4 for t in _TOKEN_RE.findall(text))
+
+
+class BuiltPrompt:
+    __slots__ = ("key", "text", "bytes", "tokens", "drinks")
+
+    def __init__(self, key: Tuple[str, int], text: str, drinks: int):
+        self.key = key
+        self.text = text
+        self.bytes = len(text.encode("utf-8"))
+        self.tokens = estimate_tokens(text)
+        self.drinks = drinks
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "menu_version": self.key[0], "oos_version": self.key[1],
+            "bytes": self.bytes, "tokens_est": self.tokens, "drinks": self.drinks,
+        }
+
+
+class PromptBuilder:
+    """Instructions Realtime compactées, générées une fois par (version menu, version OOS).
+    Les boissons en rupture ne sont pas proposées au modèle. Le texte ne dépend pas du site
+    (OOS global) : il n'entre donc pas dans la clé."""
+
+    def __init__(self, feed: MenuFeed, template: str = AGENT_INSTRUCTIONS,
+                 max_drinks: int = MAX_PROMPT_DRINKS):
+        self.feed = feed
+        self.template = compact(template)
+        self.max_drinks = max_drinks
+        self._cache: "OrderedDict[Tuple[str, int], BuiltPrompt]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self) -> BuiltPrompt:
+        catalog = self.feed.catalog
+        oos_version, oos = self.feed.oos_state()
+        key = (catalog.version, oos_version)
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                return hit
+        built = self._build(key, catalog, oos)
+        with self._lock:
+            self._cache[key] = built
+            while len(self._cache) > PROMPT_CACHE_MAX:
+                self._cache.popitem(last=False)
+        return built
+
+    def _build(self, key, catalog, oos) -> BuiltPrompt:
+        oos_names = {catalog.by_sku[s].name for s in oos if s in catalog.by_sku}
+        drinks = [d for d in catalog.drinks if d not in oos_names][: self.max_drinks]
+        text = (
+            self.template
+            .replace("{DRINKS_TEXT}", " ; ".join(drinks))
+            .replace("{MAX_QTY_PER_LINE}", str(MAX_QTY_PER_LINE))
+            .replace("{MAX_TOTAL_ITEMS}", str(MAX_TOTAL_ITEMS))
+        )
+        return BuiltPrompt(key, text, len(drinks))
@@ -0,0 +1,195 @@
+# backend/tracing.py
+from __future__ import annotations
+import os, json, time, zlib, threading
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Iterator
+
+# --- config (.env) ---
+TRACE_SAMPLE_RATE  = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))   # fraction de sessions tracées
+TRACE_FILE         = os.getenv("TRACE_FILE", "traces.json")          # "" -> pas d'export fichier
+TRACE_MAX_SESSIONS = int(os.getenv("TRACE_MAX_SESSIONS", "500"))
+TRACE_MAX_SPANS    = int(os.getenv("TRACE_MAX_SPANS", "500"))        # par session
+
+SESSION_HEADER = "X-Session-Id"
+
+_NOOP = nullcontext()
+
+
+class Span:
+    __slots__ = ("id", "parent", "name", "start_ns", "end_ns", "attrs")
+
+    def __init__(self, id: int, parent: Optional[int], name: str, attrs: Dict[str, Any]):
+        self.id = id
+        self.parent = parent
+        self.name = name
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = 0
+        self.attrs = attrs
+
+
+class _Session:
+    __slots__ = ("id", "tid", "spans", "dropped")
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.tid = zlib.crc32(session_id.encode("utf-8"))
+        self.spans: List[Span] = []
+        self.dropped = 0
+
+
+# session tracée du contexte courant (None si non échantillonnée) et span parent
+_current_session: ContextVar[Optional[_Session]] = ContextVar("trace_session", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("trace_span", default=None)
+# spans ouverts sous la racine de la requête courante (seuls ceux-là sont exportés)
+_request_spans: ContextVar[Optional[List[Span]]] = ContextVar("trace_request_spans", default=None)
+
+
+class Tracer:
+    """Spans par session (corrélation via X-Session-Id), horodatés en monotone.
+    L'échantillonnage est décidé par session (hash de l'id) : une session est tracée
+    de bout en bout ou pas du tout, et le coût hors échantillon est un seul lookup."""
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE, path: str = TRACE_FILE,
+                 max_sessions: int = TRACE_MAX_SESSIONS, max_spans: int = TRACE_MAX_SPANS):
+        self.sample_rate = sample_rate
+        self.path = path
+        self.max_sessions = max_sessions
+        self.max_spans = max_spans
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = os.getpid()
+
+    def sampled(self, session_id: str) -> bool:
+        if self.sample_rate >= 1.0:
+            return True
+        if self.sample_rate <= 0.0 or not session_id:
+            return False
+        return zlib.crc32(session_id.encode("utf-8")) % 10_000 < self.sample_rate * 10_000
+
+    # -------------------- contexte de requête --------------------
+
+    @contextmanager
+    def request(self, session_id: str, name: str, **attrs: Any) -> Iterator[None]:
+        """Span racine d'une requête HTTP ; exporte les spans de la requête à la sortie."""
+        if not self.sampled(session_id):
+            yield
+            return
+        with self._lock:
+            sess = self._sessions.get(session_id)
+            if sess is None:
+                sess = self._sessions[session_id] = _Session(session_id)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+        spans: List[Span] = []
+        tok_sess = _current_session.set(sess)
+        tok_spans = _request_spans.set(spans)
+        try:
+            with self._span(sess, name, attrs):
+                yield
+        finally:
+            _request_spans.reset(tok_spans)
+            _current_session.reset(tok_sess)
+            self._export(sess, spans)
+
+    def span(self, name: str, **attrs: Any):
+        """Span enfant dans la requête courante ; no-op si la session n'est pas tracée."""
+        sess = _current_session.get()
+        if sess is None:
+            return _NOOP
+        return self._span(sess, name, attrs)
+
+    def annotate(self, **attrs: Any) -> None:
+        """Ajoute des attributs au span courant (ex. code HTTP, nb de lignes)."""
+        spans = _request_spans.get()
+        sid = _current_span.get()
+        if spans is None or sid is None:
+            return
+        for sp in reversed(spans):
+            if sp.id == sid:
+                sp.attrs.update(attrs)
+                return
+
+    @contextmanager
+    def _span(self, sess: _Session, name: str, attrs: Dict[str, Any]) -> Iterator[None]:
+        with self._lock:
+            self._next_id += 1
+            sp = Span(self._next_id, _current_span.get(), name, attrs)
+            if len(sess.spans) < self.max_spans:
+                sess.spans.append(sp)
+            else:
+                sess.dropped += 1
+        req = _request_spans.get()
+        if req is not None:
+            req.append(sp)
+        tok = _current_span.set(sp.id)
+        try:
+            yield
+        except BaseException as e:
+            sp.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            sp.end_ns = time.perf_counter_ns()
+            _current_span.reset(tok)
+
+    # -------------------- lecture / export --------------------
+
+    def session_trace(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            sess = self._sessions.get(session_id)
+            if sess is None:
+                return None
+            spans = list(sess.spans)
+            dropped = sess.dropped
+        if not spans:
+            return {"session_id": session_id, "spans": [], "dropped": dropped}
+        t0 = spans[0].start_ns
+        depth: Dict[int, int] = {}
+        timeline = []
+        for sp in spans:
+            d = depth[sp.id] = depth.get(sp.parent, -1) + 1 if sp.parent is not None else 0
+            timeline.append({
+                "name": sp.name,
+                "depth": d,
+                "start_ms": round((sp.start_ns - t0) / 1e6, 3),
+                "duration_ms": round((sp.end_ns - sp.start_ns) / 1e6, 3) if sp.end_ns else None,
+                "attrs": sp.attrs,
+            })
+        return {
+            "session_id": session_id,
+            "total_ms": round((max(s.end_ns or s.start_ns for s in spans) - t0) / 1e6, 3),
+            "spans": timeline,
+            "dropped": dropped,
+        }
+
+    def _export(self, sess: _Session, spans: List[Span]) -> None:
+        """Chrome Trace Event Format (tableau JSON sans ']' final, accepté par Perfetto/chrome://tracing)."""
+        if not self.path:
+            return
+        with self._lock:
+            events = [
+                json.dumps({
+                    "name": sp.name, "cat": "smartdrive", "ph": "X",
+                    "ts": sp.start_ns // 1000, "dur": (sp.end_ns - sp.start_ns) // 1000,
+                    "pid": self._pid, "tid": sess.tid,
+                    "args": dict(sp.attrs, session_id=sess.id),
+                }, ensure_ascii=False)
+                for sp in spans if sp.end_ns
+            ]
+            if not events:
+                return
+            try:
+                if self._file is None:
+                    new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                    self._file = open(self.path, "a", encoding="utf-8")
+                    if new:
+                        self._file.write("[\n")
+                self._file.write(",\n".join(events) + ",\n")
+                self._file.flush()
+            except OSError:
+                self.path = ""  # disque indisponible : on garde le traçage en mémoire
@@ -12,10 +12,22 @@ let processedTrack = null;
 let dc = null; // data channel for realtime events
 
 let currentOrder = { lines: [], notes: [] };
+let currentPrice = null; // calculé par le backend (/nlu), même moteur que le POS
 let vadSilenceTimer = null;
 let currentTranscript = '';
 let muteWhileTalking = true;
 
+// Identifiant de corrélation envoyé à chaque appel backend (X-Session-Id)
+let sessionId = newSessionId();
+
+// Catalogue servi par GET /menu (noms + ruptures), rafraîchi en delta
+let menuNames = {};
+let menuOOS = new Set();
+let menuVersion = null;
+let menuEtag = null;
+let menuTimer = null;
+const MENU_POLL_MS = 30000;
+
 // ---------- Helpers UI ----------
 function $(id){ return document.getElementById(id); }
 
@@ -29,12 +41,22 @@ function appendLog(kind, msg){
 }
 
 function nameFromSKU(sku){
+  const known = menuNames[String(sku || '').toUpperCase()];
+  if (known) return known;
   return String(sku || '')
     .replace(/_/g,' ')
     .toLowerCase()
     .replace(/\b\w/g, c=>c.toUpperCase());
 }
 
+function formatPrice(price){
+  if (!price || typeof price.total_cents !== 'number') return '—';
+  const amount = (price.total_cents / 100).toLocaleString('fr-FR', {
+    style: 'currency', currency: price.currency || 'EUR'
+  });
+  return (price.unpriced && price.unpriced.length) ? `${amount} (partiel)` : amount;
+}
+
 function renderMods(mods = {}){
   const keys = Object.keys(mods||{});
   if (!keys.length) return '';
@@ -51,6 +73,7 @@ function renderOrder(){
   let totalQty = 0;
   (currentOrder.lines || []).forEach(l=>{
     const tr = document.createElement('tr');
+    if (menuOOS.has(String(l.sku || '').toUpperCase())) tr.className = 'oos';
     tr.innerHTML = `
       <td style="padding:6px 4px; border-bottom:1px solid #f2f2f2;">
         <div class="line-name"><strong>${nameFromSKU(l.sku)}</strong></div>
@@ -72,7 +95,7 @@ function renderOrder(){
       summaryEl.style.cssText = 'margin:8px 0; font-weight:600;';
       panel.insertBefore(summaryEl, panel.querySelector('#orderNotes'));
     }
-    summaryEl.textContent = `Total articles: ${totalQty} • Total: —`;
+    summaryEl.textContent = `Total articles: ${totalQty} • Total: ${formatPrice(currentPrice)}`;
   }
 
   const tips = (currentOrder.notes || []).map(n=>`• ${n}`).join('<br>');
@@ -82,13 +105,69 @@ function renderOrder(){
 }
 
 // ---------- Backend ----------
+function newSessionId(){
+  if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+  return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+// fetch + en-tête de session ; journalise temps client vs temps serveur (Server-Timing)
+async function tracedFetch(url, init = {}){
+  const headers = Object.assign({ 'X-Session-Id': sessionId }, init.headers || {});
+  const t0 = performance.now();
+  const r = await fetch(url, Object.assign({}, init, { headers }));
+  const total = performance.now() - t0;
+  const st = r.headers.get('Server-Timing') || '';
+  const durs = {};
+  st.replace(/(\w+);dur=([\d.]+)/g, (_, k, v) => { durs[k] = parseFloat(v); });
+  if (durs.app != null){
+    const parts = [`total=${total.toFixed(0)}ms`, `app=${durs.app.toFixed(0)}ms`];
+    if (durs.proxy != null) parts.push(`proxy=${(durs.proxy - durs.app).toFixed(0)}ms`);
+    appendLog('trace', `${url.replace(BACKEND, '')} ${parts.join(' ')}`);
+  }
+  return r;
+}
+
 function setBackend(url){
   BACKEND = url;
   localStorage.setItem('backendUrl', url);
+  menuVersion = null;
+  menuEtag = null;
+  startMenuPolling();
+}
+
+async function fetchMenu(){
+  const url = menuVersion
+    ? `${BACKEND}/menu?since=${encodeURIComponent(menuVersion)}`
+    : `${BACKEND}/menu`;
+  const headers = menuEtag ? { 'If-None-Match': menuEtag } : {};
+  const r = await tracedFetch(url, { headers, cache: 'no-store' });
+  if (r.status === 304) return false;
+  if (!r.ok) throw new Error(`/menu ${r.status}`);
+  const data = await r.json();
+  menuEtag = r.headers.get('ETag');
+  menuVersion = data.version || null;
+  if (data.full){
+    menuNames = {};
+    (data.items || []).forEach(it => { if (it.sku) menuNames[it.sku] = it.name; });
+    menuOOS = new Set(data.oos || []);
+  } else {
+    (data.oos_added || []).forEach(s => menuOOS.add(s));
+    (data.oos_removed || []).forEach(s => menuOOS.delete(s));
+  }
+  return true;
+}
+
+function startMenuPolling(){
+  if (menuTimer) clearInterval(menuTimer);
+  const tick = ()=> fetchMenu()
+    .then(changed => { if (changed) { renderOrder(); if (document.getElementById('orderRecap')) updateRecap(); } })
+    .catch(e => appendLog('warn', e.message || String(e)));
+  tick();
+  menuTimer = setInterval(tick, MENU_POLL_MS);
 }
 
 async function fetchToken(){
-  const r = await fetch(`${BACKEND}/token`);
+  const r = await tracedFetch(`${BACKEND}/token`);
   const txt = await r.text();
   appendLog('debug', `GET /token -> ${r.status} ${txt.slice(0,140)}`);
   if (!r.ok) throw new Error(`/token ${r.status}: ${txt}`);
@@ -98,7 +177,7 @@ async function fetchToken(){
 async function analyzeTextWithNLU(text){
   const clean = (text || '').trim();
   if (!clean) return;
-  const r = await fetch(`${BACKEND}/nlu`, {
+  const r = await tracedFetch(`${BACKEND}/nlu`, {
     method:'POST',
     headers:{'Content-Type':'application/json'},
     body: JSON.stringify({ utterance: clean })
@@ -109,6 +188,7 @@ async function analyzeTextWithNLU(text){
   const data = JSON.parse(txt);
 
   currentOrder = data.order ? data.order : data;
+  currentPrice = data.price || null;
   renderOrder();
   if (document.getElementById('orderRecap')) updateRecap();
 
@@ -116,12 +196,13 @@ async function analyzeTextWithNLU(text){
   const sendBtn = $('sendToKitchen');
   if (sendBtn) sendBtn.disabled = !!hasErrors;
   if (hasErrors) appendLog('warn', `Validation: ${data.errors.join(' | ')}`);
+  if (currentOrder.truncated) appendLog('warn', 'Phrase trop longue : analyse partielle.');
 }
 
 async function sendToKitchen(){
   const btn = $('sendToKitchen');
   if (btn) btn.disabled = true;
-  const r = await fetch(`${BACKEND}/pos/order`, {
+  const r = await tracedFetch(`${BACKEND}/pos/order`, {
     method:'POST',
     headers:{'Content-Type':'application/json'},
     body: JSON.stringify({ order: currentOrder })
@@ -322,7 +403,8 @@ function handleRealtimeMessage(data){
 
 // ---------- WebRTC Realtime ----------
 async function connectRealtime(){
-  appendLog('info', 'Connexion');
+  sessionId = newSessionId();
+  appendLog('info', `Connexion (session ${sessionId})`);
 
   token = await fetchToken();
 
@@ -414,6 +496,7 @@ window.addEventListener('DOMContentLoaded', ()=>{
   if ($('sendToKitchen')) $('sendToKitchen').onclick = sendToKitchen;
   if ($('clearOrder')) $('clearOrder').onclick = ()=>{
     currentOrder = { lines: [], notes: [] };
+    currentPrice = null;
     renderOrder();
     if (document.getElementById('orderRecap')) updateRecap();
   };
@@ -425,6 +508,7 @@ window.addEventListener('DOMContentLoaded', ()=>{
     el.addEventListener('change', ()=>{ muteWhileTalking = !!el.checked; });
   }
 
+  startMenuPolling();
   appendLog('info','UI prete. Configure le Backend, puis Connect -> Start Talking.');
 });
 
@@ -450,5 +534,7 @@ function buildRecapSentence(order){
     const modText = modParts.length ? ` (${modParts.join(', ')})` : '';
     return `${qty}× ${name}${modText}`;
   });
-  return `Vous avez commandé: ${parts.join('; ')}.`;
+  const total = formatPrice(currentPrice);
+  const totalText = total !== '—' ? ` Total: ${total}.` : '';
+  return `Vous avez commandé: ${parts.join('; ')}.${totalText}`;
 }
@@ -43,6 +43,7 @@ export async function handler(event) {
       body = event.isBase64Encoded ? Buffer.from(event.body, 'base64') : event.body;
     }
 
+    const t0 = Date.now();
     const resp = await fetch(url, {
       method: event.httpMethod || 'GET',
       headers,
@@ -57,6 +58,11 @@ export async function handler(event) {
       if (k.toLowerCase() === 'content-encoding') continue;
       respHeaders[k] = v;
     }
+    // Expose proxy round-trip next to the backend's own timing
+    const proxyTiming = `proxy;dur=${Date.now() - t0}`;
+    respHeaders['server-timing'] = respHeaders['server-timing']
+      ? `${respHeaders['server-timing']}, ${proxyTiming}`
+      : proxyTiming;
 
     const buf = Buffer.from(await resp.arrayBuffer());
     return {